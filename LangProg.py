@@ -3,13 +3,34 @@ import os
 gs_path = r"C:\Program Files\gs\gs10.05.0\bin"
 os.environ["PATH"] += os.pathsep + gs_path
 
+import re
 import json
 import time
 import io
+import bisect
+import base64
+import mmap
+import struct
 import shutil
+import sys
+import atexit
+import argparse
+import cProfile
+import pstats
+import threading
+import functools
+import collections
+import contextlib
+import hashlib
+import http.server
+import urllib.parse
 import tkinter as tk
 from tkinter import messagebox, filedialog, ttk
-from PIL import Image, ImageTk
+from PIL import Image, ImageTk, ImageDraw, ImageFilter, ImageOps
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Optional; only the draw-to-find recognizer needs it.
 
 # Helper functions for math-bold conversion using Unicode Mathematical Bold letters.
 def to_bold(text):
@@ -33,6 +54,1107 @@ def invert_bold(text, sub):
     suffix = text[idx+len(sub):]
     return to_bold(prefix) + match + to_bold(suffix)
 
+# Opt-in timing spans for the hot paths. Set LANGPROG_PROFILE=1 (or pass --profile) to get a
+# summary on stderr when the program exits, or LANGPROG_PROFILE=trace.json to also write a
+# Chrome trace (load it in chrome://tracing or Perfetto). LANGPROG_CPROFILE=<span name> (or
+# --cprofile) runs cProfile around the first occurrence of that span only.
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = None
+        self.cprofile_span = None
+        self.spans = {}  # name -> [count, total seconds, max seconds]
+        self.counters = {}  # name -> [samples, last value, max value]
+        self.events = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def configure(self, setting=None, cprofile_span=None):
+        if setting is not None and setting.strip().lower() in ("", "0", "false", "no", "off"):
+            setting = None
+        if not setting and not cprofile_span:
+            return
+        if not self.enabled:
+            atexit.register(self.dump)
+        self.enabled = True
+        if setting and setting.lower().endswith(".json"):
+            self.trace_path = setting
+        if cprofile_span:
+            self.cprofile_span = cprofile_span
+
+    @contextlib.contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        profile = None
+        if name == self.cprofile_span:
+            self.cprofile_span = None
+            profile = cProfile.Profile()
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if profile is not None:
+                profile.disable()
+                self.dump_cprofile(name, profile)
+            self.record(name, start, end)
+
+    def record(self, name, start, end):
+        duration = end - start
+        with self.lock:
+            entry = self.spans.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+            if self.trace_path:
+                self.events.append({"name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                                    "ts": (start - self.origin) * 1e6, "dur": duration * 1e6})
+
+    def count(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self.counters.setdefault(name, [0, value, value])
+            entry[0] += 1
+            entry[1] = value
+            entry[2] = max(entry[2], value)
+            if self.trace_path:
+                self.events.append({"name": name, "ph": "C", "pid": os.getpid(), "tid": threading.get_ident(),
+                                    "ts": (time.perf_counter() - self.origin) * 1e6, "args": {name: value}})
+
+    def dump_cprofile(self, name, profile):
+        path = f"langprog_{name}.prof"
+        profile.dump_stats(path)
+        print(f"cProfile of {name} written to {path}", file=sys.stderr)
+        pstats.Stats(profile, stream=sys.stderr).sort_stats("cumulative").print_stats(20)
+
+    def summary(self):
+        lines = [f"{'span':<24} {'count':>8} {'total ms':>10} {'mean ms':>10} {'max ms':>10}"]
+        for name, (count, total, longest) in sorted(self.spans.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<24} {count:>8} {total * 1000:>10.2f} {total * 1000 / count:>10.2f} {longest * 1000:>10.2f}")
+        if self.counters:
+            lines.append(f"{'counter':<24} {'samples':>8} {'last':>10} {'max':>10}")
+            for name, (samples, last, highest) in sorted(self.counters.items()):
+                lines.append(f"{name:<24} {samples:>8} {last:>10} {highest:>10}")
+        return "\n".join(lines)
+
+    def dump(self):
+        print(self.summary(), file=sys.stderr)
+        if self.trace_path:
+            with open(self.trace_path, "w") as f:
+                json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+            print(f"Trace written to {self.trace_path}", file=sys.stderr)
+
+profiler = Profiler()
+profiler.configure(os.environ.get("LANGPROG_PROFILE"), os.environ.get("LANGPROG_CPROFILE"))
+
+# Decorator form of profiler.span for whole functions and methods.
+def profiled(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Library helpers shared by the windows below. They do not touch Tk, so they can also be
+# driven headless (see benchmark.py).
+def read_metadata(metadata_file):
+    if not os.path.exists(metadata_file):
+        return {}
+    with open(metadata_file, "r") as f:
+        return json.load(f)
+
+def write_metadata(metadata_file, metadata):
+    with open(metadata_file, "w") as f:
+        json.dump(metadata, f, indent=4)
+
+def list_symbol_files(characters_folder):
+    return sorted([fname for fname in os.listdir(characters_folder) if fname.endswith(".png")])
+
+# Symbol IDs are bare PNG filenames; anything else could point outside the characters folder.
+def is_symbol_id(symbol_id):
+    return os.path.basename(symbol_id) == symbol_id and symbol_id.endswith(".png")
+
+def load_thumbnail(image_path, size):
+    image = Image.open(image_path)
+    image.thumbnail(size)
+    return image
+
+def format_symbol_info(meta):
+    type_val = meta.get("type", "")
+    sound = meta.get("sound", "")
+    meaning = meta.get("meaning", "")
+    info_text = f"Type: {type_val}\nSound: {sound}"
+    if type_val != "Letter":
+        info_text += f"\nMeaning: {meaning}"
+    return info_text
+
+# Convert the PostScript produced by a Tk canvas into a PNG (needs Ghostscript).
+@profiled("postscript_to_png")
+def postscript_to_png(ps, filepath):
+    img = Image.open(io.BytesIO(ps.encode('utf-8')))
+    img = img.convert("RGBA")
+    img.save(filepath, "png")
+
+# Packed symbol archive: a single file holding every symbol PNG plus its metadata, as an
+# alternative to the characters/ folder for copying and syncing large libraries.
+#
+# Layout: a fixed header (magic, version, index offset/length, dead bytes), the PNG blobs,
+# then a JSON index mapping symbol ID -> offset, length and metadata. Writes only ever
+# append: new blobs and a fresh index go at the end of the file and the header is rewritten
+# last to point at them. Replaced blobs and old indexes become dead bytes, which compact()
+# drops once they make up more than `compact_ratio` of the file. Reads go through mmap.
+class SymbolArchive:
+    MAGIC = b"LPAK"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHQQQ")
+
+    def __init__(self, path, compact_ratio=0.5):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.index = {}
+        self.dead_bytes = 0
+        self.file = None
+        self.map = None
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, 0, 0, 0))
+                self.write_index(f, 0)
+        self.open()
+
+    def open(self):
+        self.file = open(self.path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, index_offset, index_length, self.dead_bytes = self.HEADER.unpack_from(self.map, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"{self.path} is not a symbol archive")
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported symbol archive version {version}")
+        self.index_offset, self.index_length = index_offset, index_length
+        self.index = json.loads(self.map[index_offset:index_offset + index_length].decode("utf-8"))
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, symbol_id):
+        return symbol_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def ids(self):
+        return sorted(self.index)
+
+    def metadata(self):
+        return {symbol_id: entry["meta"] for symbol_id, entry in self.index.items()}
+
+    def read(self, symbol_id):
+        entry = self.index[symbol_id]
+        return self.map[entry["offset"]:entry["offset"] + entry["length"]]
+
+    # Append the index at the file's current end and point the header at it. The header is
+    # written last, so an interrupted write leaves the previous index in effect.
+    def write_index(self, f, dead_bytes):
+        f.seek(0, os.SEEK_END)
+        index_offset = f.tell()
+        data = json.dumps(self.index, ensure_ascii=False).encode("utf-8")
+        f.write(data)
+        f.flush()
+        f.seek(0)
+        f.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, index_offset, len(data), dead_bytes))
+        f.flush()
+
+    # Add or replace several symbols at once. `items` yields (symbol_id, png_bytes or None,
+    # meta); None keeps the stored image and only replaces the metadata.
+    # If anything fails, reopening reloads the index the on-disk header still points at.
+    def write(self, items):
+        self.close()
+        try:
+            with open(self.path, "r+b") as f:
+                _, _, _, _, index_length, dead_bytes = self.HEADER.unpack(f.read(self.HEADER.size))
+                dead_bytes += index_length
+                for symbol_id, data, meta in items:
+                    if not is_symbol_id(symbol_id):
+                        raise ValueError(f"Invalid symbol ID: {symbol_id!r}")
+                    old = self.index.get(symbol_id)
+                    if data is None:
+                        if old is None:
+                            raise KeyError(symbol_id)
+                        self.index[symbol_id] = dict(old, meta=meta)
+                        continue
+                    if old is not None:
+                        dead_bytes += old["length"]
+                    f.seek(0, os.SEEK_END)
+                    offset = f.tell()
+                    f.write(data)
+                    self.index[symbol_id] = {"offset": offset, "length": len(data), "meta": meta}
+                self.write_index(f, dead_bytes)
+        finally:
+            self.open()
+        self.maybe_compact()
+
+    def add(self, symbol_id, data, meta):
+        self.write([(symbol_id, data, meta)])
+
+    def set_metadata(self, symbol_id, meta):
+        self.write([(symbol_id, None, meta)])
+
+    def remove(self, *symbol_ids):
+        self.close()
+        try:
+            with open(self.path, "r+b") as f:
+                _, _, _, _, index_length, dead_bytes = self.HEADER.unpack(f.read(self.HEADER.size))
+                dead_bytes += index_length
+                for symbol_id in symbol_ids:
+                    dead_bytes += self.index.pop(symbol_id)["length"]
+                self.write_index(f, dead_bytes)
+        finally:
+            self.open()
+        self.maybe_compact()
+
+    def maybe_compact(self):
+        if self.dead_bytes > self.compact_ratio * len(self.map):
+            self.compact()
+
+    # Rewrite the archive with only the live blobs, then swap it into place.
+    def compact(self):
+        tmp_path = self.path + ".tmp"
+        index = {}
+        with open(tmp_path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, 0, 0, 0))
+            for symbol_id in self.ids():
+                entry = self.index[symbol_id]
+                index[symbol_id] = {"offset": f.tell(), "length": entry["length"], "meta": entry["meta"]}
+                f.write(self.read(symbol_id))
+            self.index = index
+            self.write_index(f, 0)
+        self.close()
+        os.replace(tmp_path, self.path)
+        self.open()
+
+# Convert a characters/ folder into an archive, and back. Packing into an existing archive
+# updates it in place: only new or changed PNGs are appended, changed metadata is replaced
+# and symbols no longer in the folder are removed. A new archive is built under a temporary
+# name and only moved into place once it is complete.
+def pack_library(characters_folder, archive_path):
+    metadata = read_metadata(os.path.join(characters_folder, "metadata.json"))
+    files = list_symbol_files(characters_folder)
+    def read_png(fname):
+        with open(os.path.join(characters_folder, fname), "rb") as f:
+            return f.read()
+    if not os.path.exists(archive_path):
+        tmp_path = archive_path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            with SymbolArchive(tmp_path) as archive:
+                archive.write((fname, read_png(fname), metadata.get(fname, {})) for fname in files)
+                count = len(archive)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, archive_path)
+        return count
+    with SymbolArchive(archive_path) as archive:
+        changed = []  # (symbol ID, whether the PNG changed, metadata)
+        for fname in files:
+            meta = metadata.get(fname, {})
+            if fname not in archive or archive.read(fname) != read_png(fname):
+                changed.append((fname, True, meta))
+            elif archive.index[fname]["meta"] != meta:
+                changed.append((fname, False, meta))
+        if changed:
+            archive.write((fname, read_png(fname) if new_png else None, meta) for fname, new_png, meta in changed)
+        missing = set(archive.ids()) - set(files)
+        if missing:
+            archive.remove(*sorted(missing))
+        return len(archive)
+
+def unpack_archive(archive_path, characters_folder):
+    if not os.path.exists(characters_folder):
+        os.makedirs(characters_folder)
+    metadata_file = os.path.join(characters_folder, "metadata.json")
+    metadata = read_metadata(metadata_file)
+    with SymbolArchive(archive_path) as archive:
+        for symbol_id in archive.ids():
+            if not is_symbol_id(symbol_id):
+                raise ValueError(f"Archive contains an invalid symbol ID: {symbol_id!r}")
+        for symbol_id in archive.ids():
+            with open(os.path.join(characters_folder, symbol_id), "wb") as f:
+                f.write(archive.read(symbol_id))
+        metadata.update(archive.metadata())
+        write_metadata(metadata_file, metadata)
+        return len(archive)
+
+# Sentence documents store a sentence as symbol IDs (the PNG filenames) so it can be saved,
+# reloaded and shared. Each distinct ID is listed once; the text itself is the sequence of
+# indices into that list as fixed-width (2 or 4 byte) little-endian integers, base64-encoded.
+SENTENCE_FORMAT = "langprog-sentence"
+SENTENCE_VERSION = 1
+SENTENCE_INDEX_CODES = {2: "H", 4: "I"}  # struct codes; standard sizes with "<"
+
+def save_sentence_document(path, symbols, direction):
+    table = list(dict.fromkeys(symbols))
+    positions = {symbol_id: i for i, symbol_id in enumerate(table)}
+    index_size = 2 if len(table) <= 0xFFFF else 4
+    indices = struct.pack(f"<{len(symbols)}{SENTENCE_INDEX_CODES[index_size]}",
+                          *(positions[symbol_id] for symbol_id in symbols))
+    document = {
+        "format": SENTENCE_FORMAT,
+        "version": SENTENCE_VERSION,
+        "direction": direction,
+        "symbols": table,
+        "index_size": index_size,
+        "text": base64.b64encode(indices).decode("ascii")
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f)
+
+def load_sentence_document(path):
+    with open(path, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    if document.get("format") != SENTENCE_FORMAT:
+        raise ValueError(f"{path} is not a sentence document")
+    if document.get("version") != SENTENCE_VERSION:
+        raise ValueError(f"Unsupported sentence document version {document.get('version')}")
+    index_size = document.get("index_size")
+    if index_size not in SENTENCE_INDEX_CODES:
+        raise ValueError(f"Unsupported index size {index_size!r} in {path}")
+    data = base64.b64decode(document["text"])
+    if len(data) % index_size:
+        raise ValueError(f"{path} is truncated")
+    indices = struct.unpack(f"<{len(data) // index_size}{SENTENCE_INDEX_CODES[index_size]}", data)
+    table = document["symbols"]
+    return [table[i] for i in indices], document.get("direction", "Left-to-Right")
+
+# Process-wide cache of decoded glyph images, shared by every window. Windows acquire() the
+# symbol image they show at a given size and release() it when they are done with it.
+# Entries nobody holds stay cached, least recently used first out, while the decoded pixels
+# fit in `budget_bytes`. Saving or deleting a symbol calls invalidate() so the next acquire
+# decodes the file again; windows still holding the old image keep it until they release it.
+class GlyphRegistry:
+    def __init__(self, budget_bytes=64 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.entries = {}  # (path, size) -> [photo, refcount, bytes]
+        self.unused = collections.OrderedDict()  # keys with refcount 0, least recently used first
+        self.owners = {}  # photo name -> (path, size), for release()
+        self.used_bytes = 0
+
+    def acquire(self, path, size):
+        key = (os.path.abspath(path), tuple(size))
+        entry = self.entries.get(key)
+        if entry is None:
+            image = load_thumbnail(path, size)
+            photo = ImageTk.PhotoImage(image)
+            entry = [photo, 0, image.width * image.height * 4]
+            self.entries[key] = entry
+            self.owners[str(photo)] = key
+            self.used_bytes += entry[2]
+        entry[1] += 1
+        self.unused.pop(key, None)
+        self.evict()
+        return entry[0]
+
+    def release(self, photo):
+        key = self.owners.get(str(photo))
+        entry = self.entries.get(key)
+        if entry is None or entry[0] is not photo:
+            return
+        if entry[1] > 0:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self.unused[key] = None
+        self.evict()
+
+    def invalidate(self, path):
+        path = os.path.abspath(path)
+        for key in [key for key in self.entries if key[0] == path]:
+            self.drop(key)
+
+    def drop(self, key):
+        photo, _, size_bytes = self.entries.pop(key)
+        self.unused.pop(key, None)
+        self.owners.pop(str(photo), None)
+        self.used_bytes -= size_bytes
+
+    # Forget every cached image, held or not. Holders keep their PhotoImage; releasing it
+    # afterwards does nothing.
+    def clear(self):
+        self.entries.clear()
+        self.unused.clear()
+        self.owners.clear()
+        self.used_bytes = 0
+
+    # Only images nobody holds can go; held ones may keep the total over budget.
+    def evict(self):
+        while self.used_bytes > self.budget_bytes and self.unused:
+            key = next(iter(self.unused))
+            self.drop(key)
+
+glyph_registry = GlyphRegistry()
+
+# Bulk metadata edits. A query is one or more conditions joined by "and", each of the form
+#   field=value, field!=value, field~text (contains) or field in [a, b, c]
+# for example "type=Character and sound in [p, b]". Values containing "and", commas or
+# brackets can be quoted: meaning="salt and pepper", meaning in ["a, b", c]. Only
+# metadata.json changes; the PNGs are never touched.
+METADATA_FIELDS = ("type", "sound", "meaning")
+SYMBOL_TYPES = ("Character", "Letter", "Both")
+QUERY_TOKEN = re.compile(r"""\s*(?:"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)'|(!=|=|~|\[|\]|,)|((?:[^\s"'=~\[\],!]|!(?!=))+))""")
+
+# Split a query into (kind, text) tokens: "quoted" strings (a backslash escapes the next
+# character), "op" for = != ~ [ ] and commas, and bare "word"s.
+def tokenize_query(query):
+    query = query.strip()
+    tokens = []
+    pos = 0
+    while pos < len(query):
+        match = QUERY_TOKEN.match(query, pos)
+        if not match:
+            raise ValueError(f"Unterminated quote in query: {query[pos:].strip()}")
+        double, single, op, word = match.groups()
+        if double is not None or single is not None:
+            tokens.append(("quoted", re.sub(r"\\(.)", r"\1", double if double is not None else single)))
+        elif op:
+            tokens.append(("op", op))
+        else:
+            tokens.append(("word", word))
+        pos = match.end()
+    return tokens
+
+def parse_query(query):
+    tokens = tokenize_query(query)
+    conditions = []
+    pos = 0
+
+    # One quoted string, or the bare words up to the next operator or `stop` word, joined by
+    # single spaces. None if there is neither.
+    def take_value(stop=None):
+        nonlocal pos
+        if pos < len(tokens) and tokens[pos][0] == "quoted":
+            pos += 1
+            return tokens[pos - 1][1]
+        words = []
+        while pos < len(tokens) and tokens[pos][0] == "word" and tokens[pos][1] != stop:
+            words.append(tokens[pos][1])
+            pos += 1
+        return " ".join(words) if words else None
+
+    while pos < len(tokens):
+        kind, field = tokens[pos]
+        if kind != "word":
+            raise ValueError(f"Expected a field name, got {field!r}")
+        if field not in METADATA_FIELDS:
+            raise ValueError(f"Unknown field {field!r}; expected one of {', '.join(METADATA_FIELDS)}")
+        pos += 1
+        token = tokens[pos] if pos < len(tokens) else None
+        if token in (("op", "="), ("op", "!="), ("op", "~")):
+            pos += 1
+            op, value = token[1], take_value(stop="and") or ""
+        elif token == ("word", "in") and tokens[pos + 1:pos + 2] == [("op", "[")]:
+            pos += 2
+            op, value = "in", []
+            while True:
+                item = take_value()
+                if item is not None:
+                    value.append(item)
+                if pos >= len(tokens):
+                    raise ValueError(f"Missing ']' in the list for {field}")
+                pos += 1
+                if tokens[pos - 1] == ("op", "]"):
+                    break
+                if tokens[pos - 1] != ("op", ","):
+                    raise ValueError(f"Expected ',' or ']' in the list for {field}, got {tokens[pos - 1][1]!r}")
+        else:
+            raise ValueError(f"Expected =, !=, ~ or 'in [...]' after {field!r}")
+        conditions.append((field, op, value))
+        if pos < len(tokens):
+            if tokens[pos] != ("word", "and"):
+                raise ValueError(f"Expected 'and' between conditions, got {tokens[pos][1]!r}")
+            pos += 1
+            if pos == len(tokens):
+                raise ValueError("Query ends with 'and'")
+    return conditions
+
+def match_query(meta, conditions):
+    for field, op, value in conditions:
+        current = meta.get(field, "")
+        if op == "=" and current != value:
+            return False
+        if op == "!=" and current == value:
+            return False
+        if op == "~" and value.lower() not in current.lower():
+            return False
+        if op == "in" and current not in value:
+            return False
+    return True
+
+def select_symbols(metadata, filenames, query):
+    conditions = parse_query(query)
+    return [fname for fname in filenames if match_query(metadata.get(fname, {}), conditions)]
+
+# Parse ["type=Letter", "sound=p"] into {"type": "Letter", "sound": "p"}.
+def parse_assignments(assignments):
+    changes = {}
+    for assignment in assignments:
+        field, sep, value = assignment.partition("=")
+        field = field.strip()
+        if not sep or field not in METADATA_FIELDS:
+            raise ValueError(f"Expected FIELD=VALUE with FIELD one of {', '.join(METADATA_FIELDS)}, got {assignment!r}")
+        changes[field] = value.strip()
+    if "type" in changes and changes["type"] not in SYMBOL_TYPES:
+        raise ValueError(f"Type must be one of {', '.join(SYMBOL_TYPES)}")
+    return changes
+
+# Apply `changes` to every symbol in `filenames`, in memory. Letters have no meaning, as in
+# the editor. Returns the number of symbols whose metadata actually changed.
+def bulk_update_metadata(metadata, filenames, changes):
+    changed = 0
+    for fname in filenames:
+        meta = dict(metadata.get(fname, {"type": "Character", "sound": "", "meaning": ""}))
+        meta.update(changes)
+        if meta.get("type") == "Letter":
+            meta["meaning"] = ""
+        if meta != metadata.get(fname):
+            metadata[fname] = meta
+            changed += 1
+    return changed
+
+# Draw-to-find: compare what is being drawn against every saved symbol. Each image is
+# reduced to a small, blurred bitmap of its ink (cropped to the ink's bounding box, so
+# position and scale do not matter), and all library bitmaps are kept as rows of one
+# matrix, so a match is a single matrix-vector product. Ink bitmaps are all non-negative
+# and mostly alike, so raw cosine similarity rates almost any two symbols highly; rows and
+# queries are centred on the library's mean bitmap before normalizing, which leaves only
+# what distinguishes a symbol. Needs NumPy; without it the recognizer is simply unavailable.
+SKETCH_FEATURE_SIZE = 16
+# Measured on benchmark.generate_library output (1k and 5k symbols): redrawing a symbol
+# scores >= 0.90 against the original 97% of the time, while 2.5-4% of other symbols
+# have an unrelated neighbour that high (plus the straight strokes, which are the same
+# symbol once scale is ignored).
+SKETCH_DUPLICATE_SCORE = 0.90
+
+# Ink as white-on-black, whether the symbol was drawn on white or on a transparent background.
+def ink_image(image):
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        image = Image.alpha_composite(Image.new("RGBA", image.size, "white"), image)
+    return ImageOps.invert(image.convert("L"))
+
+# The blurred ink bitmap as a flat uint8 vector, or None for a blank image.
+def sketch_features(image):
+    ink = ink_image(image)
+    bbox = ink.point(lambda v: 255 if v > 64 else 0).getbbox()
+    if bbox is None:
+        return None
+    ink = ink.crop(bbox)
+    side = max(ink.size)
+    square = Image.new("L", (side, side), 0)
+    square.paste(ink, ((side - ink.width) // 2, (side - ink.height) // 2))
+    small = square.resize((SKETCH_FEATURE_SIZE, SKETCH_FEATURE_SIZE), Image.BOX).filter(ImageFilter.GaussianBlur(1))
+    return np.asarray(small, dtype=np.uint8).ravel()
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def render_strokes(strokes, size, width=3):
+    image = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(image)
+    for stroke in strokes:
+        if len(stroke) > 1:
+            draw.line(stroke, fill=0, width=width, joint="curve")
+    return image
+
+# The bitmaps are cached as uint8 in characters/sketch_features.npz and only recomputed
+# for symbols whose PNG changed since the last refresh(). Refreshing a large library takes
+# seconds, so the windows call refresh_async(), which refreshes on a background thread;
+# matching meanwhile uses whatever was indexed before.
+class SketchRecognizer:
+    def __init__(self, characters_folder):
+        self.characters_folder = characters_folder
+        self.cache_file = os.path.join(characters_folder, "sketch_features.npz")
+        self.names = []
+        self.mtimes = []
+        self.bitmaps = np.zeros((0, SKETCH_FEATURE_SIZE * SKETCH_FEATURE_SIZE), dtype=np.uint8)
+        # (names, mean, matrix) as used for matching; replaced as a whole by refresh().
+        self.index = ([], np.zeros(self.bitmaps.shape[1], dtype=np.float32), np.zeros(self.bitmaps.shape, dtype=np.float32))
+        self.cache_loaded = False
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pending = False
+
+    def load_cache(self):
+        self.cache_loaded = True
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with np.load(self.cache_file) as cache:
+                if "bitmaps" in cache and cache["bitmaps"].shape[1] == self.bitmaps.shape[1]:
+                    self.names = cache["names"].tolist()
+                    self.mtimes = cache["mtimes"].tolist()
+                    self.bitmaps = cache["bitmaps"]
+        except Exception as e:
+            print(f"Ignoring sketch feature cache: {e}")
+
+    def save_cache(self):
+        temp_path = self.cache_file + ".tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.savez(f, names=np.array(self.names, dtype=str), mtimes=np.array(self.mtimes), bitmaps=self.bitmaps)
+            os.replace(temp_path, self.cache_file)
+        except Exception as e:
+            print(f"Could not write sketch feature cache: {e}")
+
+    def build_index(self):
+        features = normalize_rows(self.bitmaps.astype(np.float32))
+        blank = ~features.any(axis=1)
+        mean = features[~blank].mean(axis=0) if (~blank).any() else np.zeros(features.shape[1], dtype=np.float32)
+        matrix = normalize_rows(features - mean)
+        matrix[blank] = 0
+        self.index = (list(self.names), mean, matrix)
+
+    @profiled("sketch_refresh")
+    def refresh(self):
+        if not self.cache_loaded:
+            self.load_cache()
+        known = {name: (mtime, row) for row, (name, mtime) in enumerate(zip(self.names, self.mtimes))}
+        blank = np.zeros(self.bitmaps.shape[1], dtype=np.uint8)
+        names, mtimes, rows = [], [], []
+        dirty = False
+        for fname in list_symbol_files(self.characters_folder):
+            path = os.path.join(self.characters_folder, fname)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            cached = known.get(fname)
+            if cached is not None and cached[0] == mtime:
+                row = self.bitmaps[cached[1]]
+            else:
+                dirty = True
+                try:
+                    with Image.open(path) as image:
+                        row = sketch_features(image)
+                except Exception as e:
+                    print(f"Error reading symbol {fname}: {e}")
+                    continue
+                if row is None:
+                    row = blank
+            names.append(fname)
+            mtimes.append(mtime)
+            rows.append(row)
+        dirty = dirty or len(names) != len(self.names)
+        self.names, self.mtimes = names, mtimes
+        self.bitmaps = np.array(rows, dtype=np.uint8).reshape(len(rows), self.bitmaps.shape[1])
+        self.build_index()
+        if dirty:
+            self.save_cache()
+
+    # Start a background refresh, or have the running one go round again so it also sees
+    # files saved since it started.
+    def refresh_async(self):
+        with self.lock:
+            if self.thread is not None:
+                self.pending = True
+                return
+            self.thread = threading.Thread(target=self.refresh_loop, daemon=True)
+            self.thread.start()
+
+    def refresh_loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing sketch features: {e}")
+            with self.lock:
+                if not self.pending:
+                    self.thread = None
+                    return
+                self.pending = False
+
+    @property
+    def refreshing(self):
+        return self.thread is not None
+
+    # Returns up to k (filename, score) pairs, best first; scores are cosine similarities of
+    # the mean-centred bitmaps.
+    @profiled("sketch_match")
+    def match_image(self, image, k=5):
+        names, mean, matrix = self.index
+        vector = sketch_features(image)
+        if vector is None or not names:
+            return []
+        vector = normalize_rows(normalize_rows(vector.astype(np.float32)) - mean)
+        scores = matrix @ vector
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(names[i], float(scores[i])) for i in best]
+
+    def match_strokes(self, strokes, canvas_size, k=5):
+        return self.match_image(render_strokes(strokes, canvas_size), k)
+
+# Ink bounds of each symbol, in source-image pixels, cached in characters/glyph_metrics.json.
+# They are recomputed whenever a symbol is saved, or on first use if the PNG changed behind
+# our back, and give every glyph its own advance width in the sentence layout.
+class GlyphMetricsCache:
+    def __init__(self, characters_folder):
+        self.characters_folder = characters_folder
+        self.metrics_file = os.path.join(characters_folder, "glyph_metrics.json")
+        self.metrics = {}  # filename -> {"size": [w, h], "ink": [x0, y0, x1, y1] or None, "mtime": ...}
+        self.checked = set()  # filenames whose mtime was verified in this process
+        self.dirty = False
+        try:
+            self.metrics = read_metadata(self.metrics_file)
+        except Exception as e:
+            print(f"Ignoring glyph metrics cache: {e}")
+
+    def save(self):
+        if self.dirty:
+            write_metadata(self.metrics_file, self.metrics)
+            self.dirty = False
+
+    def update(self, fname):
+        path = os.path.join(self.characters_folder, fname)
+        with Image.open(path) as image:
+            self.metrics[fname] = {"size": list(image.size), "ink": ink_bounds(image), "mtime": os.path.getmtime(path)}
+        self.checked.add(fname)
+        self.dirty = True
+        return self.metrics[fname]
+
+    def remove(self, fname):
+        if self.metrics.pop(fname, None) is not None:
+            self.dirty = True
+        self.checked.discard(fname)
+
+    def get(self, fname):
+        entry = self.metrics.get(fname)
+        if entry is None or fname not in self.checked:
+            try:
+                if entry is None or entry.get("mtime") != os.path.getmtime(os.path.join(self.characters_folder, fname)):
+                    entry = self.update(fname)
+            except Exception:
+                return None
+            self.checked.add(fname)
+        return entry
+
+    # (advance, ink offset) of the symbol's thumbnail at `size`, or None if it can't be read.
+    def advance(self, fname, size):
+        entry = self.get(fname)
+        if entry is None:
+            return None
+        width, height = entry["size"]
+        return glyph_advance(entry["ink"], min(1.0, size / width, size / height), size)
+
+def ink_bounds(image):
+    bbox = ink_image(image).point(lambda v: 255 if v > 64 else 0).getbbox()
+    return list(bbox) if bbox else None
+
+# Advance width and left ink offset of a glyph drawn at `scale`; blank glyphs act as a space.
+def glyph_advance(ink, scale, size):
+    if ink is None:
+        return max(1, size // 4), 0
+    x0 = int(ink[0] * scale)
+    x1 = max(x0 + 1, int(round(ink[2] * scale)))
+    return x1 - x0, x0
+
+# Width-based line breaking for a sentence. `advances` holds each glyph's width; glyphs are
+# separated by `spacing` and a line breaks before the glyph that would overflow
+# `line_width`. Positions are logical (distance from the start of the line) so the same
+# layout serves both directions; screen_x() mirrors them for right-to-left. reflow() starts
+# again from the line before the one containing the edit point (a glyph that got narrower
+# or was removed may now fit there), leaving earlier lines untouched.
+class SentenceLayout:
+    def __init__(self, line_width, spacing=4):
+        self.line_width = line_width
+        self.spacing = spacing
+        self.advances = []
+        self.xs = []  # logical x of each glyph
+        self.lines = []  # line number of each glyph
+        self.line_starts = [0]  # index of the first glyph on each line
+
+    def reflow(self, advances, start=0):
+        self.advances = advances
+        start = max(0, min(start, len(self.xs)))
+        line = max(0, bisect.bisect_right(self.line_starts, start) - 2)
+        first = self.line_starts[line]
+        del self.xs[first:]
+        del self.lines[first:]
+        del self.line_starts[line + 1:]
+        x = 0
+        for index in range(first, len(advances)):
+            advance = advances[index]
+            if x > 0 and x + advance > self.line_width:
+                line += 1
+                self.line_starts.append(index)
+                x = 0
+            self.xs.append(x)
+            self.lines.append(line)
+            x += advance + self.spacing
+
+    def line_count(self):
+        return len(self.line_starts)
+
+    def line_range(self, line):
+        end = self.line_starts[line + 1] if line + 1 < len(self.line_starts) else len(self.xs)
+        return self.line_starts[line], end
+
+    def extent(self):
+        return max((x + advance for x, advance in zip(self.xs, self.advances)), default=0)
+
+    def screen_x(self, index, direction, width=None):
+        if direction == "Right-to-Left":
+            return (self.line_width if width is None else width) - self.xs[index] - self.advances[index]
+        return self.xs[index]
+
+# Local HTTP render service, so other tools can show text in the script without the Tk app:
+#
+#   GET /metadata                 all symbol metadata as JSON
+#   GET /metadata/<id>            one symbol's metadata
+#   GET /glyph/<id>?size=64       the symbol as a PNG scaled to fit size x size
+#   GET /sentence?ids=a.png,b.png&dir=rtl&size=40&width=800&spacing=4
+#   GET /sentence?ipa=...         as above, spelling the IPA with symbols by their sound
+#
+# Symbols come from the characters folder, or from a packed archive (see SymbolArchive).
+# Responses carry ETags derived from the symbols' content and are kept in an in-memory LRU
+# cache keyed by that ETag; requests are served concurrently.
+class RenderService:
+    def __init__(self, characters_folder, archive_path=None, cache_entries=512):
+        self.characters_folder = characters_folder
+        self.metadata_file = os.path.join(characters_folder, "metadata.json")
+        self.archive = SymbolArchive(archive_path) if archive_path else None
+        self.cache_entries = cache_entries
+        self.cache = collections.OrderedDict()  # etag -> (content type, body)
+        self.digests = {}  # symbol ID -> (file signature, sha1 of its PNG)
+        self.metadata = {}
+        self.metadata_signature = None
+        self.lock = threading.Lock()
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+    # Re-read metadata.json only when it changed on disk.
+    def current_metadata(self):
+        if self.archive is not None:
+            return self.archive.metadata()
+        try:
+            stat = os.stat(self.metadata_file)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        with self.lock:
+            if signature != self.metadata_signature:
+                self.metadata = read_metadata(self.metadata_file) if signature else {}
+                self.metadata_signature = signature
+            return self.metadata
+
+    def symbol_ids(self):
+        if self.archive is not None:
+            return self.archive.ids()
+        return list_symbol_files(self.characters_folder)
+
+    def symbol_path(self, symbol_id):
+        if not is_symbol_id(symbol_id):
+            raise KeyError(symbol_id)
+        return os.path.join(self.characters_folder, symbol_id)
+
+    def read_symbol(self, symbol_id):
+        if self.archive is not None:
+            return self.archive.read(symbol_id)
+        with open(self.symbol_path(symbol_id), "rb") as f:
+            return f.read()
+
+    # Content hash of a symbol's PNG, recomputed only when the file (or archive entry) changes.
+    def symbol_digest(self, symbol_id):
+        if self.archive is not None:
+            entry = self.archive.index[symbol_id]
+            signature = (entry["offset"], entry["length"])
+        else:
+            try:
+                stat = os.stat(self.symbol_path(symbol_id))
+            except OSError:
+                raise KeyError(symbol_id)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached = self.digests.get(symbol_id)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha1(self.read_symbol(symbol_id)).hexdigest()
+        with self.lock:
+            self.digests[symbol_id] = (signature, digest)
+        return digest
+
+    def cached(self, etag, render):
+        with self.lock:
+            if etag in self.cache:
+                self.cache.move_to_end(etag)
+                return self.cache[etag]
+        response = render()
+        with self.lock:
+            self.cache[etag] = response
+            while len(self.cache) > self.cache_entries:
+                self.cache.popitem(last=False)
+        return response
+
+    # The symbol scaled to fit size x size, enlarging small symbols as well as shrinking
+    # large ones.
+    def glyph_image(self, symbol_id, size):
+        image = Image.open(io.BytesIO(self.read_symbol(symbol_id))).convert("RGBA")
+        scale = size / max(image.size)
+        if scale != 1:
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+        return image
+
+    # Greedy longest match of the IPA text against the symbols' sounds. Spaces become gaps
+    # (None); characters no symbol covers are skipped.
+    def ipa_to_symbols(self, ipa):
+        by_sound = {}
+        for symbol_id, meta in sorted(self.current_metadata().items()):
+            sound = meta.get("sound", "")
+            if sound and sound not in by_sound:
+                by_sound[sound] = symbol_id
+        longest = max((len(sound) for sound in by_sound), default=0)
+        symbols = []
+        i = 0
+        while i < len(ipa):
+            if ipa[i].isspace():
+                symbols.append(None)
+                i += 1
+                continue
+            for length in range(min(longest, len(ipa) - i), 0, -1):
+                symbol_id = by_sound.get(ipa[i:i + length])
+                if symbol_id is not None:
+                    symbols.append(symbol_id)
+                    i += length
+                    break
+            else:
+                i += 1
+        return symbols
+
+    # Lay the sentence out like the sentence builder: proportional advances, lines broken at
+    # `width` pixels, right-aligned for RTL. The image is cropped to the longest line.
+    def render_sentence(self, symbols, direction, size, width, spacing):
+        glyphs, advances, offsets = [], [], []
+        for symbol_id in symbols:
+            glyph = self.glyph_image(symbol_id, size) if symbol_id else None
+            if glyph is None:
+                advance, offset = max(1, size // 2), 0
+            else:
+                advance, offset = glyph_advance(ink_bounds(glyph), 1.0, size)
+            glyphs.append(glyph)
+            advances.append(advance)
+            offsets.append(offset)
+        layout = SentenceLayout(width, spacing)
+        layout.reflow(advances)
+        extent = max(1, layout.extent())
+        line_height = size + 4
+        image = Image.new("RGBA", (extent + 4, line_height * layout.line_count()), "white")
+        direction = "Right-to-Left" if direction == "rtl" else "Left-to-Right"
+        for index, glyph in enumerate(glyphs):
+            if glyph is None:
+                continue
+            x = 2 + layout.screen_x(index, direction, extent) - offsets[index]
+            y = layout.lines[index] * line_height + 2 + (size - glyph.height) // 2
+            image.paste(glyph, (x, y), glyph)
+        return image
+
+    @staticmethod
+    def png_bytes(image):
+        out = io.BytesIO()
+        image.save(out, "png")
+        return out.getvalue()
+
+    # Returns (status, headers, body) for a GET request.
+    def handle(self, path, params, if_none_match=None):
+        parts = [urllib.parse.unquote(part) for part in path.strip("/").split("/") if part]
+        size = min(max(int(params.get("size", "64")), 8), 1024)
+        if parts == ["metadata"] or (len(parts) == 2 and parts[0] == "metadata"):
+            metadata = self.current_metadata()
+            if len(parts) == 2:
+                if parts[1] not in metadata:
+                    raise KeyError(parts[1])
+                metadata = metadata[parts[1]]
+            body = json.dumps(metadata, ensure_ascii=False, indent=4).encode("utf-8")
+            etag = hashlib.sha1(body).hexdigest()
+            render = lambda: ("application/json", body)
+        elif len(parts) == 2 and parts[0] == "glyph":
+            symbol_id = parts[1]
+            etag = hashlib.sha1(f"glyph:{self.symbol_digest(symbol_id)}:{size}".encode()).hexdigest()
+            render = lambda: ("image/png", self.png_bytes(self.glyph_image(symbol_id, size)))
+        elif parts == ["sentence"]:
+            if "ipa" in params:
+                symbols = self.ipa_to_symbols(params["ipa"])
+            else:
+                symbols = [symbol_id for symbol_id in params.get("ids", "").split(",") if symbol_id]
+            direction = "rtl" if params.get("dir", "ltr").lower() == "rtl" else "ltr"
+            size = min(max(int(params.get("size", "40")), 8), 1024)
+            width = min(max(int(params.get("width", "800")), size), 20000)
+            spacing = min(max(int(params.get("spacing", "4")), 0), 1000)
+            digests = ",".join(self.symbol_digest(s) if s else "" for s in symbols)
+            etag = hashlib.sha1(f"sentence:{direction}:{size}:{width}:{spacing}:{digests}".encode()).hexdigest()
+            render = lambda: ("image/png", self.png_bytes(self.render_sentence(symbols, direction, size, width, spacing)))
+        else:
+            return 404, {"Content-Type": "application/json"}, b'{"error": "not found"}'
+        etag = f'"{etag}"'
+        if if_none_match == etag:
+            return 304, {"ETag": etag}, b""
+        content_type, body = self.cached(etag, render)
+        return 200, {"Content-Type": content_type, "ETag": etag, "Cache-Control": "no-cache"}, body
+
+class RenderRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            with profiler.span("http_request"):
+                status, headers, body = self.server.service.handle(url.path, params, self.headers.get("If-None-Match"))
+        except KeyError as e:
+            status, headers, body = 404, {"Content-Type": "application/json"}, json.dumps({"error": f"unknown symbol {e.args[0]}"}).encode()
+        except ValueError as e:
+            status, headers, body = 400, {"Content-Type": "application/json"}, json.dumps({"error": str(e)}).encode()
+        except OSError as e:
+            # An unreadable or undecodable symbol file; still answer rather than drop the connection.
+            status, headers, body = 500, {"Content-Type": "application/json"}, json.dumps({"error": f"cannot read symbol: {e}"}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def make_render_server(characters_folder, host="127.0.0.1", port=8765, archive_path=None, verbose=False):
+    server = http.server.ThreadingHTTPServer((host, port), RenderRequestHandler)
+    server.daemon_threads = True
+    server.service = RenderService(characters_folder, archive_path)
+    server.verbose = verbose
+    return server
+
 # Main application window.
 class MainApp(tk.Tk):
     def __init__(self):
@@ -44,6 +1166,9 @@ class MainApp(tk.Tk):
         self.metadata = {}
         self.characters_list = []  # List of image filenames
         self.current_index = 0
+        self.tk_image = None
+        self.sketch_recognizer = None
+        self.glyph_metrics = None
 
         self.create_widgets()
         self.load_data()
@@ -62,6 +1187,8 @@ class MainApp(tk.Tk):
         self.export_button.grid(row=0, column=3, padx=5)
         self.sentence_builder_button = tk.Button(control_frame, text="Open Sentence Builder", command=self.open_sentence_builder)
         self.sentence_builder_button.grid(row=0, column=4, padx=5)
+        self.bulk_edit_button = tk.Button(control_frame, text="Bulk Edit", command=self.open_bulk_edit)
+        self.bulk_edit_button.grid(row=1, column=0, columnspan=5, pady=5)
 
         self.image_label = tk.Label(self)
         self.image_label.pack(pady=10)
@@ -77,21 +1204,21 @@ class MainApp(tk.Tk):
         self.delete_button = tk.Button(self, text="Delete Symbol", command=self.delete_symbol)
         self.delete_button.pack(pady=5)
 
+    @profiled("load_data")
     def load_data(self):
         if not os.path.exists(self.characters_folder):
             os.makedirs(self.characters_folder)
-        if os.path.exists(self.metadata_file):
-            try:
-                with open(self.metadata_file, "r") as f:
-                    self.metadata = json.load(f)
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not load metadata: {e}")
-                self.metadata = {}
-        else:
+        if self.glyph_metrics is None:
+            self.glyph_metrics = GlyphMetricsCache(self.characters_folder)
+        try:
+            self.metadata = read_metadata(self.metadata_file)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not load metadata: {e}")
             self.metadata = {}
-        self.characters_list = sorted([fname for fname in os.listdir(self.characters_folder) if fname.endswith(".png")])
+        self.characters_list = list_symbol_files(self.characters_folder)
         self.current_index = 0 if self.characters_list else -1
 
+    @profiled("update_display")
     def update_display(self):
         if self.current_index == -1 or not self.characters_list:
             self.image_label.config(image="", text="No symbols available.")
@@ -99,21 +1226,15 @@ class MainApp(tk.Tk):
         else:
             filename = self.characters_list[self.current_index]
             image_path = os.path.join(self.characters_folder, filename)
+            previous, self.tk_image = self.tk_image, None
             try:
-                image = Image.open(image_path)
-                image.thumbnail((400, 400))
-                self.tk_image = ImageTk.PhotoImage(image)
+                self.tk_image = glyph_registry.acquire(image_path, (400, 400))
                 self.image_label.config(image=self.tk_image, text="")
             except Exception as e:
-                self.image_label.config(text="Error loading image.")
-            meta = self.metadata.get(filename, {})
-            type_val = meta.get("type", "")
-            sound = meta.get("sound", "")
-            meaning = meta.get("meaning", "")
-            info_text = f"Type: {type_val}\nSound: {sound}"
-            if type_val != "Letter":
-                info_text += f"\nMeaning: {meaning}"
-            self.info_label.config(text=info_text)
+                self.image_label.config(image="", text="Error loading image.")
+            if previous is not None:
+                glyph_registry.release(previous)
+            self.info_label.config(text=format_symbol_info(self.metadata.get(filename, {})))
 
     def prev_symbol(self):
         if self.characters_list:
@@ -125,6 +1246,15 @@ class MainApp(tk.Tk):
             self.current_index = (self.current_index + 1) % len(self.characters_list)
             self.update_display()
 
+    # Created on first use, then brought up to date with the characters folder on each call.
+    def get_sketch_recognizer(self):
+        if np is None:
+            return None
+        if self.sketch_recognizer is None:
+            self.sketch_recognizer = SketchRecognizer(self.characters_folder)
+        self.sketch_recognizer.refresh_async()
+        return self.sketch_recognizer
+
     def open_draw_window(self):
         draw_window = DrawWindow(self)
         self.wait_window(draw_window)
@@ -153,6 +1283,7 @@ class MainApp(tk.Tk):
             except Exception as e:
                 messagebox.showerror("Error", f"Error importing symbol: {e}")
                 return
+            self.update_glyph_metrics(new_filename)
             self.metadata[new_filename] = {"type": "Character", "sound": "", "meaning": ""}
             self.save_metadata()
             self.load_data()
@@ -173,9 +1304,17 @@ class MainApp(tk.Tk):
             except Exception as e:
                 messagebox.showerror("Error", f"Error exporting symbol: {e}")
 
+    @profiled("save_metadata")
     def save_metadata(self):
-        with open(self.metadata_file, "w") as f:
-            json.dump(self.metadata, f, indent=4)
+        write_metadata(self.metadata_file, self.metadata)
+
+    # Recompute the layout metrics of a symbol whose image was just written.
+    def update_glyph_metrics(self, filename):
+        try:
+            self.glyph_metrics.update(filename)
+            self.glyph_metrics.save()
+        except Exception as e:
+            print(f"Could not update glyph metrics for {filename}: {e}")
 
     def delete_symbol(self):
         if not self.characters_list:
@@ -189,6 +1328,9 @@ class MainApp(tk.Tk):
             except Exception as e:
                 messagebox.showerror("Error", f"Could not delete file: {e}")
                 return
+            glyph_registry.invalidate(file_path)
+            self.glyph_metrics.remove(filename)
+            self.glyph_metrics.save()
             if filename in self.metadata:
                 del self.metadata[filename]
                 self.save_metadata()
@@ -203,6 +1345,11 @@ class MainApp(tk.Tk):
     def open_sentence_builder(self):
         SentenceBuilderWindow(self)
 
+    def open_bulk_edit(self):
+        bulk_window = BulkEditWindow(self)
+        self.wait_window(bulk_window)
+        self.update_display()
+
 # DrawWindow with a tabbed interface for creation and IPA keyboard.
 class DrawWindow(tk.Toplevel):
     def __init__(self, master):
@@ -218,9 +1365,26 @@ class DrawWindow(tk.Toplevel):
         self.geometry(f"{self.base_window_width}x{self.base_window_height}")
         self.last_x, self.last_y = None, None
         self.ipa_key_widgets = []
+        self.strokes = []  # Points drawn so far, one list per stroke, for sketch matching
+        self.matches = []  # (filename, score) of the closest existing symbols
+        self.match_images = []  # Thumbnails borrowed from glyph_registry for the matches
+        self.match_job = None
+        self.index_job = None
+        self.recognizer = master.get_sketch_recognizer()
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
         self.create_widgets()
         self.bind_events()
 
+    def destroy(self):
+        if self.match_job is not None:
+            self.after_cancel(self.match_job)
+            self.match_job = None
+        if self.index_job is not None:
+            self.after_cancel(self.index_job)
+            self.index_job = None
+        self.release_match_images()
+        super().destroy()
+
     def create_widgets(self):
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(expand=True, fill="both")
@@ -244,6 +1408,22 @@ class DrawWindow(tk.Toplevel):
                                 height=int(self.base_canvas_height * self.scale))
         self.canvas.pack(pady=10)
 
+        # Closest existing symbols, updated while drawing.
+        self.matches_frame = tk.Frame(self.creation_frame)
+        self.matches_frame.pack()
+        tk.Label(self.matches_frame, text="Closest matches:").pack(side=tk.LEFT)
+        self.match_labels = []
+        if self.recognizer is None:
+            tk.Label(self.matches_frame, text="(install numpy to enable)", fg="gray").pack(side=tk.LEFT)
+        else:
+            for _ in range(5):
+                lbl = tk.Label(self.matches_frame, compound="top", font=("Arial", 8))
+                lbl.pack(side=tk.LEFT, padx=2)
+                self.match_labels.append(lbl)
+            self.index_label = tk.Label(self.matches_frame, text="", fg="gray")
+            self.index_label.pack(side=tk.LEFT)
+            self.poll_recognizer()
+
         tk.Label(self.creation_frame, text="Select Type:").pack()
         self.type_var = tk.StringVar(value="Character")
         self.type_menu = tk.OptionMenu(self.creation_frame, self.type_var, "Character", "Letter", "Both")
@@ -311,15 +1491,63 @@ class DrawWindow(tk.Toplevel):
 
     def on_button_press(self, event):
         self.last_x, self.last_y = event.x, event.y
+        self.strokes.append([(event.x, event.y)])
 
+    @profiled("on_move_press")
     def on_move_press(self, event):
         x, y = event.x, event.y
         self.canvas.create_line(self.last_x, self.last_y, x, y, width=3, fill="black",
                                   capstyle=tk.ROUND, smooth=True)
         self.last_x, self.last_y = x, y
+        if self.strokes:
+            self.strokes[-1].append((x, y))
+        if self.recognizer is not None and self.match_job is None:
+            self.match_job = self.after(80, self.update_matches)
+        if profiler.enabled:
+            profiler.count("canvas_items", len(self.canvas.find_all()))
 
     def on_button_release(self, event):
         self.last_x, self.last_y = None, None
+        if self.recognizer is not None:
+            self.update_matches()
+
+    def release_match_images(self):
+        for photo in self.match_images:
+            glyph_registry.release(photo)
+        self.match_images = []
+
+    # The recognizer indexes the library on a background thread; show that it is busy and
+    # redo the matches once it is done.
+    def poll_recognizer(self):
+        self.index_job = None
+        if self.recognizer.refreshing:
+            self.index_label.config(text="(indexing symbols...)")
+            self.index_job = self.after(200, self.poll_recognizer)
+            return
+        if self.index_label.cget("text"):
+            self.index_label.config(text="")
+            if self.strokes:
+                self.update_matches()
+
+    def update_matches(self):
+        if self.match_job is not None:
+            self.after_cancel(self.match_job)
+            self.match_job = None
+        canvas_size = (int(self.canvas.cget("width")), int(self.canvas.cget("height")))
+        self.matches = self.recognizer.match_strokes(self.strokes, canvas_size, k=len(self.match_labels))
+        self.release_match_images()
+        for index, lbl in enumerate(self.match_labels):
+            if index >= len(self.matches):
+                lbl.config(image="", text="")
+                continue
+            fname, score = self.matches[index]
+            try:
+                photo = glyph_registry.acquire(os.path.join("characters", fname), (40, 40))
+            except Exception:
+                lbl.config(image="", text=f"{score:.2f}")
+                continue
+            self.match_images.append(photo)
+            lbl.config(image=photo, text=f"{score:.2f}")
 
     def add_ipa(self, sym):
         current = self.ipa_display.cget("text")
@@ -360,19 +1588,24 @@ class DrawWindow(tk.Toplevel):
             self.meaning_entry.config(state="normal")
 
     def save_symbol(self):
+        if self.recognizer is not None:
+            self.update_matches()
+            if self.matches and self.matches[0][1] >= SKETCH_DUPLICATE_SCORE:
+                meta = self.master.metadata.get(self.matches[0][0], {})
+                if not messagebox.askyesno("Possible Duplicate",
+                                           f"This looks like an existing symbol ({self.matches[0][0]}, sound: {meta.get('sound', '')}).\nSave anyway?"):
+                    return
         timestamp = int(time.time() * 1000)
         filename = f"character_{timestamp}.png"
         filepath = os.path.join("characters", filename)
         if not os.path.exists("characters"):
             os.makedirs("characters")
         try:
-            ps = self.canvas.postscript(colormode='color')
-            img = Image.open(io.BytesIO(ps.encode('utf-8')))
-            img = img.convert("RGBA")
-            img.save(filepath, "png")
+            postscript_to_png(self.canvas.postscript(colormode='color'), filepath)
         except Exception as e:
             messagebox.showerror("Error", f"Error saving image: {e}")
             return
+        self.master.update_glyph_metrics(filename)
         meta = {
             "type": self.type_var.get(),
             "sound": self.ipa_display.cget("text"),
@@ -583,10 +1816,19 @@ class EditSymbolWindow(tk.Toplevel):
         self.geometry(f"{self.base_window_width}x{self.base_window_height}")
         self.last_x, self.last_y = None, None
         self.ipa_key_widgets = []
+        self.tk_image = None
+        self.image_changed = False  # Only re-rasterize the canvas if it was drawn on or cleared
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
         self.create_widgets()
         self.bind_events()
         self.load_existing_data()
 
+    def destroy(self):
+        if self.tk_image is not None:
+            glyph_registry.release(self.tk_image)
+            self.tk_image = None
+        super().destroy()
+
     def create_widgets(self):
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(expand=True, fill="both")
@@ -675,9 +1917,7 @@ class EditSymbolWindow(tk.Toplevel):
     def load_existing_data(self):
         filepath = os.path.join(self.characters_folder, self.filename)
         try:
-            image = Image.open(filepath)
-            image.thumbnail((int(self.base_canvas_width * self.scale), int(self.base_canvas_height * self.scale)))
-            self.tk_image = ImageTk.PhotoImage(image)
+            self.tk_image = glyph_registry.acquire(filepath, (int(self.base_canvas_width * self.scale), int(self.base_canvas_height * self.scale)))
             self.canvas.create_image(0, 0, image=self.tk_image, anchor="nw")
         except Exception as e:
             messagebox.showerror("Error", f"Error loading symbol image: {e}")
@@ -691,11 +1931,15 @@ class EditSymbolWindow(tk.Toplevel):
     def on_button_press(self, event):
         self.last_x, self.last_y = event.x, event.y
 
+    @profiled("on_move_press")
     def on_move_press(self, event):
         x, y = event.x, event.y
         self.canvas.create_line(self.last_x, self.last_y, x, y, width=3, fill="black",
                                   capstyle=tk.ROUND, smooth=True)
         self.last_x, self.last_y = x, y
+        self.image_changed = True
+        if profiler.enabled:
+            profiler.count("canvas_items", len(self.canvas.find_all()))
 
     def on_button_release(self, event):
         self.last_x, self.last_y = None, None
@@ -712,6 +1956,7 @@ class EditSymbolWindow(tk.Toplevel):
 
     def clear_canvas(self):
         self.canvas.delete("all")
+        self.image_changed = True
 
     def zoom_in(self):
         self.scale *= 1.1
@@ -743,14 +1988,14 @@ class EditSymbolWindow(tk.Toplevel):
 
     def save_changes(self):
         filepath = os.path.join(self.characters_folder, self.filename)
-        try:
-            ps = self.canvas.postscript(colormode='color')
-            img = Image.open(io.BytesIO(ps.encode('utf-8')))
-            img = img.convert("RGBA")
-            img.save(filepath, "png")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error saving image: {e}")
-            return
+        if self.image_changed:
+            try:
+                postscript_to_png(self.canvas.postscript(colormode='color'), filepath)
+            except Exception as e:
+                messagebox.showerror("Error", f"Error saving image: {e}")
+                return
+            glyph_registry.invalidate(filepath)
+            self.master.update_glyph_metrics(self.filename)
         meta = {
             "type": self.type_var.get(),
             "sound": self.ipa_display.cget("text"),
@@ -761,28 +2006,132 @@ class EditSymbolWindow(tk.Toplevel):
         messagebox.showinfo("Saved", "Changes saved successfully!")
         self.destroy()
 
+# Table of all symbols for editing the metadata of many symbols at once.
+class BulkEditWindow(tk.Toplevel):
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Bulk Edit")
+        self.geometry("700x600")
+        self.create_widgets()
+        self.populate_table()
+
+    def create_widgets(self):
+        query_frame = tk.Frame(self)
+        query_frame.pack(fill="x", padx=10, pady=5)
+        tk.Label(query_frame, text="Select where:").pack(side=tk.LEFT)
+        self.query_entry = tk.Entry(query_frame)
+        self.query_entry.pack(side=tk.LEFT, expand=True, fill="x", padx=5)
+        self.query_entry.bind("<Return>", lambda event: self.select_matching())
+        tk.Button(query_frame, text="Select Matching", command=self.select_matching).pack(side=tk.LEFT)
+        tk.Label(self, text='e.g. type=Character and sound in [p, b]   (also field!=value, field~text)',
+                 fg="gray").pack(anchor="w", padx=10)
+
+        table_frame = tk.Frame(self)
+        table_frame.pack(expand=True, fill="both", padx=10, pady=5)
+        columns = ("filename",) + METADATA_FIELDS
+        self.table = ttk.Treeview(table_frame, columns=columns, show="headings", selectmode="extended")
+        for column in columns:
+            self.table.heading(column, text=column.capitalize())
+            self.table.column(column, width=150 if column == "filename" else 120)
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        self.table.pack(side=tk.LEFT, expand=True, fill="both")
+        scrollbar.pack(side=tk.LEFT, fill="y")
+        self.table.bind("<<TreeviewSelect>>", lambda event: self.update_selection_label())
+        self.selection_label = tk.Label(self, text="0 selected")
+        self.selection_label.pack()
+
+        # One row per field: tick "Set" to overwrite that field on every selected symbol.
+        set_frame = tk.Frame(self)
+        set_frame.pack(pady=5)
+        self.set_vars = {}
+        self.value_widgets = {}
+        for row, field in enumerate(METADATA_FIELDS):
+            self.set_vars[field] = tk.BooleanVar(value=False)
+            tk.Checkbutton(set_frame, text=f"Set {field}", variable=self.set_vars[field]).grid(row=row, column=0, sticky="w")
+            if field == "type":
+                self.type_var = tk.StringVar(value="Character")
+                widget = tk.OptionMenu(set_frame, self.type_var, *SYMBOL_TYPES)
+            else:
+                widget = tk.Entry(set_frame, width=30)
+            widget.grid(row=row, column=1, sticky="w", padx=5, pady=2)
+            self.value_widgets[field] = widget
+
+        tk.Button(self, text="Apply to Selected", command=self.apply_changes).pack(pady=10)
+
+    def populate_table(self):
+        self.table.delete(*self.table.get_children())
+        for fname in self.master.characters_list:
+            meta = self.master.metadata.get(fname, {})
+            self.table.insert("", tk.END, iid=fname, values=(fname,) + tuple(meta.get(field, "") for field in METADATA_FIELDS))
+        self.update_selection_label()
+
+    def update_selection_label(self):
+        self.selection_label.config(text=f"{len(self.table.selection())} selected")
+
+    def select_matching(self):
+        try:
+            matches = select_symbols(self.master.metadata, self.master.characters_list, self.query_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.table.selection_set(matches)
+        if matches:
+            self.table.see(matches[0])
+
+    def apply_changes(self):
+        selected = list(self.table.selection())
+        if not selected:
+            messagebox.showinfo("Bulk Edit", "No symbols selected.")
+            return
+        changes = {}
+        for field in METADATA_FIELDS:
+            if self.set_vars[field].get():
+                changes[field] = self.type_var.get() if field == "type" else self.value_widgets[field].get()
+        if not changes:
+            messagebox.showinfo("Bulk Edit", "Tick at least one field to set.")
+            return
+        changed = bulk_update_metadata(self.master.metadata, selected, changes)
+        if changed:
+            self.master.save_metadata()
+        for fname in selected:
+            meta = self.master.metadata.get(fname, {})
+            self.table.item(fname, values=(fname,) + tuple(meta.get(field, "") for field in METADATA_FIELDS))
+        messagebox.showinfo("Bulk Edit", f"Updated {changed} of {len(selected)} symbols.")
+
 # Sentence Builder window.
 class SentenceBuilderWindow(tk.Toplevel):
     def __init__(self, master):
         super().__init__(master)
         self.title("Sentence Builder")
-        self.geometry("800x600")
+        self.geometry("800x640")
         self.characters_folder = "characters"
-        self.max_cols = 20  # Maximum symbols per row
-        self.sentence = []  # List of PhotoImage objects for symbols in the sentence
-        self.symbol_images = {}  # Mapping from filename -> small PhotoImage
+        self.glyph_size = 40  # Thumbnail size of each symbol
+        self.line_height = 44
+        self.canvas_width = 760
+        self.canvas_height = 200
+        self.max_rows = self.canvas_height // self.line_height  # Lines shown per page
+        self.page = 0
+        self.sentence = []  # Symbol IDs (filenames) in the sentence
+        self.advances = []  # (advance, ink offset) of each symbol in the sentence
+        self.advance_widths = []  # Just the advances, as passed to the layout
+        self.layout = SentenceLayout(self.canvas_width - 8)
+        self.symbol_images = {}  # Mapping from filename -> small PhotoImage borrowed from glyph_registry
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
         self.load_symbols()
         self.create_widgets()
 
+    def destroy(self):
+        for photo in self.symbol_images.values():
+            glyph_registry.release(photo)
+        self.symbol_images = {}
+        super().destroy()
+
     def load_symbols(self):
-        files = sorted([fname for fname in os.listdir(self.characters_folder) if fname.endswith(".png")])
-        for fname in files:
+        for fname in list_symbol_files(self.characters_folder):
             path = os.path.join(self.characters_folder, fname)
             try:
-                image = Image.open(path)
-                image.thumbnail((40, 40))
-                photo = ImageTk.PhotoImage(image)
-                self.symbol_images[fname] = photo
+                self.symbol_images[fname] = glyph_registry.acquire(path, (self.glyph_size, self.glyph_size))
             except Exception as e:
                 print(f"Error loading symbol {fname}: {e}")
 
@@ -794,16 +2143,28 @@ class SentenceBuilderWindow(tk.Toplevel):
         # When changed, re-render the sentence.
         self.direction_menu = tk.OptionMenu(direction_frame, self.direction_var, "Left-to-Right", "Right-to-Left", command=lambda _: self.render_sentence())
         self.direction_menu.pack(side=tk.LEFT)
+        tk.Label(direction_frame, text="Spacing:").pack(side=tk.LEFT, padx=(10, 0))
+        self.spacing_var = tk.IntVar(value=self.layout.spacing)
+        tk.Spinbox(direction_frame, from_=0, to=40, width=4, textvariable=self.spacing_var,
+                   command=self.spacing_changed).pack(side=tk.LEFT)
         
-        self.sentence_frame = tk.Frame(self, bg="white", width=760, height=200)
-        self.sentence_frame.pack(pady=10)
-        self.sentence_frame.grid_propagate(False)
-        # Ensure grid columns expand evenly.
-        for i in range(self.max_cols):
-            self.sentence_frame.grid_columnconfigure(i, weight=1)
-        
-        clear_btn = tk.Button(self, text="Clear Sentence", command=self.clear_sentence)
-        clear_btn.pack(pady=5)
+        self.sentence_canvas = tk.Canvas(self, bg="white", width=self.canvas_width, height=self.canvas_height,
+                                         highlightthickness=0)
+        self.sentence_canvas.pack(pady=10)
+
+        page_frame = tk.Frame(self)
+        page_frame.pack()
+        tk.Button(page_frame, text="<< Page", command=self.prev_page).pack(side=tk.LEFT, padx=5)
+        self.page_label = tk.Label(page_frame, text="Page 1 / 1")
+        self.page_label.pack(side=tk.LEFT, padx=5)
+        tk.Button(page_frame, text="Page >>", command=self.next_page).pack(side=tk.LEFT, padx=5)
+
+        file_frame = tk.Frame(self)
+        file_frame.pack(pady=5)
+        clear_btn = tk.Button(file_frame, text="Clear Sentence", command=self.clear_sentence)
+        clear_btn.pack(side=tk.LEFT, padx=5)
+        tk.Button(file_frame, text="Save Sentence", command=self.save_sentence).pack(side=tk.LEFT, padx=5)
+        tk.Button(file_frame, text="Load Sentence", command=self.load_sentence).pack(side=tk.LEFT, padx=5)
         
         self.keyboard_frame = tk.Frame(self)
         self.keyboard_frame.pack(pady=10)
@@ -820,39 +2181,156 @@ class SentenceBuilderWindow(tk.Toplevel):
                 col = 0
                 row += 1
 
+    # Missing symbols (deleted since the sentence was saved) take half a cell.
+    def symbol_advance(self, fname):
+        advance = self.master.glyph_metrics.advance(fname, self.glyph_size)
+        return advance if advance is not None else (self.glyph_size // 2, 0)
+
+    def page_count(self):
+        return max(1, -(-self.layout.line_count() // self.max_rows))
+
+    # Lay the sentence out again from glyph `start` onwards.
+    def reflow(self, start=0):
+        self.layout.reflow(self.advance_widths, start)
+
+    def set_sentence(self, symbols):
+        self.sentence = list(symbols)
+        self.advances = [self.symbol_advance(fname) for fname in self.sentence]
+        self.advance_widths = [advance for advance, _ in self.advances]
+        self.master.glyph_metrics.save()
+        self.reflow()
+        self.page = 0
+        self.render_sentence()
+
     def add_symbol(self, fname):
-        photo = self.symbol_images.get(fname)
-        # If Right-to-Left is selected, insert the new symbol at the beginning; otherwise, append.
-        if self.direction_var.get() == "Right-to-Left":
-            self.sentence.insert(0, photo)
-        else:
-            self.sentence.append(photo)
+        # The sentence is kept in reading order whatever the direction; render_sentence mirrors
+        # Right-to-Left lines. Show the page the symbol landed on.
+        self.sentence.append(fname)
+        self.advances.append(self.symbol_advance(fname))
+        self.advance_widths.append(self.advances[-1][0])
+        self.reflow(len(self.sentence) - 1)
+        self.page = self.page_count() - 1
+        self.master.glyph_metrics.save()
+        self.render_sentence()
+
+    def spacing_changed(self):
+        try:
+            self.layout.spacing = max(0, int(self.spacing_var.get()))
+        except (tk.TclError, ValueError):
+            return
+        self.reflow()
         self.render_sentence()
 
+    def prev_page(self):
+        if self.page > 0:
+            self.page -= 1
+            self.render_sentence()
+
+    def next_page(self):
+        if self.page < self.page_count() - 1:
+            self.page += 1
+            self.render_sentence()
+
+    # Only the glyphs on the current page's lines are drawn.
+    @profiled("render_sentence")
     def render_sentence(self):
-        for widget in self.sentence_frame.winfo_children():
-            widget.destroy()
-        if self.direction_var.get() == "Left-to-Right":
-            for index, photo in enumerate(self.sentence):
-                row = index // self.max_cols
-                col = index % self.max_cols
-                lbl = tk.Label(self.sentence_frame, image=photo, bg="white")
-                lbl.grid(row=row, column=col, padx=2, pady=2, sticky="e")
-        else:
-            # For Right-to-Left, place symbols in order so that the first symbol is at the far right.
-            for index, photo in enumerate(self.sentence):
-                row = index // self.max_cols
-                # Calculate column so that symbols appear flush right.
-                col = (self.max_cols - 1) - (index % self.max_cols)
-                lbl = tk.Label(self.sentence_frame, image=photo, bg="white")
-                lbl.grid(row=row, column=col, padx=2, pady=2, sticky="e")
-        for i in range(self.max_cols):
-            self.sentence_frame.grid_columnconfigure(i, weight=1)
+        self.sentence_canvas.delete("all")
+        self.page = min(self.page, self.page_count() - 1)
+        self.page_label.config(text=f"Page {self.page + 1} / {self.page_count()}")
+        direction = self.direction_var.get()
+        first_line = self.page * self.max_rows
+        last_line = min(first_line + self.max_rows, self.layout.line_count())
+        for line in range(first_line, last_line):
+            y = (line - first_line) * self.line_height + (self.line_height - self.glyph_size) // 2
+            start, end = self.layout.line_range(line)
+            for index in range(start, end):
+                x = 4 + self.layout.screen_x(index, direction) - self.advances[index][1]
+                photo = self.symbol_images.get(self.sentence[index])
+                if photo is not None:
+                    self.sentence_canvas.create_image(x, y, image=photo, anchor="nw")
+                else:
+                    self.sentence_canvas.create_text(x + self.advances[index][0] // 2, y + self.glyph_size // 2,
+                                                     text="?", fill="red")
 
     def clear_sentence(self):
-        self.sentence = []
-        self.render_sentence()
+        self.set_sentence([])
+
+    def save_sentence(self):
+        path = filedialog.asksaveasfilename(title="Save Sentence", defaultextension=".lpsent",
+                                            filetypes=[("Sentence Documents", "*.lpsent")])
+        if path:
+            try:
+                save_sentence_document(path, self.sentence, self.direction_var.get())
+            except Exception as e:
+                messagebox.showerror("Error", f"Error saving sentence: {e}")
+
+    def load_sentence(self):
+        path = filedialog.askopenfilename(title="Load Sentence",
+                                          filetypes=[("Sentence Documents", "*.lpsent")])
+        if path:
+            try:
+                symbols, direction = load_sentence_document(path)
+            except Exception as e:
+                messagebox.showerror("Error", f"Error loading sentence: {e}")
+                return
+            self.direction_var.set(direction)
+            self.set_sentence(symbols)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Imaginary Language Builder")
+    parser.add_argument("--profile", nargs="?", const="1", metavar="TRACE.json",
+                        help="Record timing spans; print a summary on exit and optionally write a Chrome trace.")
+    parser.add_argument("--cprofile", metavar="SPAN", help="Run cProfile around the first occurrence of SPAN.")
+    parser.add_argument("--pack", metavar="ARCHIVE", help="Pack the characters folder into a single archive file (updating it if it exists) and exit.")
+    parser.add_argument("--unpack", metavar="ARCHIVE", help="Extract an archive file into the characters folder and exit.")
+    parser.add_argument("--set", action="append", metavar="FIELD=VALUE",
+                        help="Bulk edit: set FIELD on every symbol matching --where, then exit. May be repeated.")
+    parser.add_argument("--where", metavar="QUERY", help='Symbols to bulk edit, e.g. "sound in [p, b]".')
+    parser.add_argument("--dry-run", action="store_true", help="With --set, list the matching symbols without saving.")
+    parser.add_argument("--serve", action="store_true", help="Run the local HTTP render service instead of the GUI.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address for --serve (default: %(default)s).")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --serve (default: %(default)s).")
+    parser.add_argument("--archive", metavar="ARCHIVE", help="With --serve, read symbols from a packed archive.")
+    args = parser.parse_args()
+    profiler.configure(args.profile, args.cprofile)
+    if args.pack:
+        print(f"Packed {pack_library('characters', args.pack)} symbols into {args.pack}")
+        sys.exit(0)
+    if args.unpack:
+        try:
+            count = unpack_archive(args.unpack, 'characters')
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Extracted {count} symbols into characters")
+        sys.exit(0)
+    if args.set:
+        if not args.where:
+            parser.error("--set requires --where")
+        metadata_file = os.path.join("characters", "metadata.json")
+        metadata = read_metadata(metadata_file)
+        try:
+            changes = parse_assignments(args.set)
+            selected = select_symbols(metadata, list_symbol_files("characters"), args.where)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.dry_run:
+            print("\n".join(selected))
+            print(f"{len(selected)} symbols match")
+            sys.exit(0)
+        changed = bulk_update_metadata(metadata, selected, changes)
+        if changed:
+            write_metadata(metadata_file, metadata)
+        print(f"Updated {changed} of {len(selected)} matching symbols")
+        sys.exit(0)
+    if args.serve:
+        server = make_render_server("characters", args.host, args.port, args.archive, verbose=True)
+        print(f"Serving symbols on http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+        server.service.close()
+        sys.exit(0)
     app = MainApp()
     app.mainloop()
@@ -0,0 +1,268 @@
+# Benchmark harness for LangProg.py.
+#
+# Generates synthetic symbol libraries (a characters/ folder plus metadata.json) at several
+# sizes and times the core operations against them. The file-level work runs headless; the
+# Tk parts (PhotoImage creation, the sentence builder and canvas saving) only run when a
+# display is available, e.g. under Xvfb:
+#
+#   python benchmark.py --output results.json
+#   xvfb-run -a python benchmark.py --tk --output results.json
+#   python benchmark.py --output new.json --compare results.json
+#
+# Results are written as JSON so runs from different versions can be compared.
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+import LangProg
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+TYPES = ["Character", "Letter", "Both"]
+SOUNDS = ["p", "b", "t", "d", "k", "g", "s", "z", "m", "n", "l", "r", "i", "u", "ə", "aɪ"]
+
+# Draw a few random strokes, roughly like a hand-drawn symbol.
+def make_symbol_image(rng, image_size):
+    img = Image.new("RGBA", (image_size, image_size), "white")
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(1, 4)):
+        points = [(rng.randint(0, image_size - 1), rng.randint(0, image_size - 1)) for _ in range(rng.randint(2, 6))]
+        draw.line(points, fill="black", width=max(1, image_size // 40))
+    return img
+
+# Build (or reuse) a synthetic library of `size` symbols under workdir/lib_<size>.
+def generate_library(workdir, size, image_size, seed=0):
+    root = os.path.join(workdir, f"lib_{size}_{image_size}")
+    characters_folder = os.path.join(root, "characters")
+    marker = os.path.join(root, "complete")
+    if os.path.exists(marker):
+        return root
+    os.makedirs(characters_folder, exist_ok=True)
+    rng = random.Random(seed)
+    metadata = {}
+    for i in range(size):
+        filename = f"character_{i:08d}.png"
+        make_symbol_image(rng, image_size).save(os.path.join(characters_folder, filename), "png")
+        type_val = rng.choice(TYPES)
+        metadata[filename] = {
+            "type": type_val,
+            "sound": "".join(rng.choice(SOUNDS) for _ in range(rng.randint(1, 3))),
+            "meaning": f"meaning {i}" if type_val != "Letter" else ""
+        }
+    LangProg.write_metadata(os.path.join(characters_folder, "metadata.json"), metadata)
+    with open(marker, "w") as f:
+        f.write(str(size))
+    return root
+
+# `setup`, if given, runs untimed before each repeat.
+def time_operation(func, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+    }
+
+def headless_operations(root):
+    characters_folder = os.path.join(root, "characters")
+    metadata_file = os.path.join(characters_folder, "metadata.json")
+    metadata = LangProg.read_metadata(metadata_file)
+    files = LangProg.list_symbol_files(characters_folder)
+    out_metadata = os.path.join(root, "metadata_out.json")
+    save_path = os.path.join(root, "saved_symbol.png")
+    sample = Image.open(os.path.join(characters_folder, files[0])).convert("RGBA")
+
+    def load_data():
+        LangProg.read_metadata(metadata_file)
+        LangProg.list_symbol_files(characters_folder)
+
+    def update_display():
+        LangProg.load_thumbnail(os.path.join(characters_folder, files[0]), (400, 400))
+        LangProg.format_symbol_info(metadata.get(files[0], {}))
+
+    def save_metadata():
+        LangProg.write_metadata(out_metadata, metadata)
+
+    def load_symbols():
+        for fname in LangProg.list_symbol_files(characters_folder):
+            LangProg.load_thumbnail(os.path.join(characters_folder, fname), (40, 40))
+
+    # Everything save_symbol does after the PostScript conversion.
+    def save_symbol():
+        sample.save(save_path, "png")
+        metadata["character_benchmark.png"] = {"type": "Character", "sound": "", "meaning": ""}
+        LangProg.write_metadata(out_metadata, metadata)
+        del metadata["character_benchmark.png"]
+
+    return [
+        ("load_data", load_data),
+        ("update_display", update_display),
+        ("save_metadata", save_metadata),
+        ("load_symbols", load_symbols),
+        ("save_symbol", save_symbol),
+    ]
+
+def display_available():
+    try:
+        probe = LangProg.tk.Tk()
+    except LangProg.tk.TclError:
+        return False
+    probe.destroy()
+    return True
+
+# The Tk windows use a "characters" folder relative to the working directory, so these run
+# with the library root as cwd. Operations are (name, func, setup). Displaying symbols goes
+# through LangProg.glyph_registry, so those are timed twice: cold, with the registry
+# cleared before every repeat, and warm, served from it.
+def tk_operations(app, sentence_length):
+    files = list(app.characters_list)
+
+    def update_display():
+        app.current_index = 0
+        app.update_display()
+        app.update_idletasks()
+
+    def load_symbols():
+        builder = LangProg.SentenceBuilderWindow(app)
+        builder.update_idletasks()
+        builder.destroy()
+
+    builder = LangProg.SentenceBuilderWindow(app)
+    builder.set_sentence([files[i % len(files)] for i in range(sentence_length)])
+
+    def render_sentence():
+        builder.render_sentence()
+        builder.update_idletasks()
+
+    canvas = LangProg.tk.Canvas(app, width=400, height=400, bg="white")
+    rng = random.Random(0)
+    for _ in range(200):
+        canvas.create_line(rng.randint(0, 399), rng.randint(0, 399), rng.randint(0, 399), rng.randint(0, 399),
+                           width=3, fill="black", capstyle=LangProg.tk.ROUND, smooth=True)
+    save_path = os.path.abspath("saved_symbol_tk.png")
+
+    def save_symbol():
+        LangProg.postscript_to_png(canvas.postscript(colormode='color'), save_path)
+        app.save_metadata()
+
+    cold = LangProg.glyph_registry.clear
+    operations = [
+        ("load_data", app.load_data, None),
+        ("update_display", update_display, cold),
+        ("update_display_warm", update_display, None),
+        ("save_metadata", app.save_metadata, None),
+        ("load_symbols", load_symbols, cold),
+        ("load_symbols_warm", load_symbols, None),
+        ("render_sentence", render_sentence, None),
+    ]
+    if LangProg.shutil.which("gs") or LangProg.shutil.which("gswin64c"):
+        operations.append(("save_symbol", save_symbol, None))
+    return operations, builder
+
+def run_tk(root, sentence_length, repeat):
+    results = []
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        app = LangProg.MainApp()
+        app.withdraw()
+        operations, builder = tk_operations(app, sentence_length)
+        for name, func, setup in operations:
+            results.append(dict(operation=name, mode="tk", **time_operation(func, repeat, setup)))
+        builder.destroy()
+        app.destroy()
+    finally:
+        os.chdir(cwd)
+    return results
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return ""
+
+# Print a table of current vs baseline medians; returns True if anything regressed.
+def compare(current, baseline, threshold):
+    base = {(r["size"], r["mode"], r["operation"]): r for r in baseline["results"]}
+    regressed = False
+    print(f"{'size':>8} {'mode':>8} {'operation':<20} {'baseline':>10} {'current':>10} {'ratio':>7}", file=sys.stderr)
+    for r in current["results"]:
+        old = base.get((r["size"], r["mode"], r["operation"]))
+        if old is None:
+            continue
+        ratio = r["median"] / old["median"] if old["median"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{r['size']:>8} {r['mode']:>8} {r['operation']:<20} {old['median']:>10.4f} {r['median']:>10.4f} {ratio:>7.2f}{flag}", file=sys.stderr)
+    return regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark LangProg.py against synthetic symbol libraries.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--image-size", type=int, default=128, help="Side length of the generated PNGs.")
+    parser.add_argument("--sentence-length", type=int, default=500, help="Symbols in the rendered sentence (Tk only).")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "langprog_bench"),
+                        help="Where generated libraries are kept between runs.")
+    parser.add_argument("--tk", action="store_true", help="Also time the Tk windows (needs a display or Xvfb).")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout.")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against.")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Median ratio that counts as a regression.")
+    args = parser.parse_args(argv)
+
+    run_tk_parts = args.tk
+    if run_tk_parts and not display_available():
+        print("No display available; skipping Tk benchmarks (try xvfb-run).", file=sys.stderr)
+        run_tk_parts = False
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "image_size": args.image_size,
+        "results": [],
+    }
+    for size in args.sizes:
+        print(f"Preparing library with {size} symbols...", file=sys.stderr)
+        root = generate_library(args.workdir, size, args.image_size)
+        for name, func in headless_operations(root):
+            report["results"].append(dict(size=size, operation=name, mode="headless", **time_operation(func, args.repeat)))
+        if run_tk_parts:
+            for result in run_tk(root, args.sentence_length, args.repeat):
+                report["results"].append(dict(size=size, **result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
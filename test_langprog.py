@@ -0,0 +1,355 @@
+# Tests for the headless parts of LangProg.py (no display needed). Run with:
+#
+#   python -m pytest -q
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+import unittest.mock
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from PIL import Image, ImageDraw
+
+import LangProg
+
+def png_bytes(color, size=(32, 32)):
+    image = Image.new("RGBA", size, "white")
+    ImageDraw.Draw(image).line([(2, 2), (size[0] - 3, size[1] - 3)], fill=color, width=3)
+    buffer = io.BytesIO()
+    image.save(buffer, "png")
+    return buffer.getvalue()
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+# Stands in for ImageTk.PhotoImage, which needs a Tk root.
+class FakePhoto:
+    count = 0
+
+    def __init__(self, image):
+        FakePhoto.count += 1
+        self.name = f"photo{FakePhoto.count}"
+
+    def __str__(self):
+        return self.name
+
+@unittest.mock.patch.object(LangProg.ImageTk, "PhotoImage", FakePhoto)
+class GlyphRegistryTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(self.tmp, f"character_{i}.png")
+            with open(path, "wb") as f:
+                f.write(png_bytes("black", (40, 40)))
+            self.paths.append(path)
+
+    def test_shares_and_evicts_unused(self):
+        registry = LangProg.GlyphRegistry(budget_bytes=2 * 40 * 40 * 4)
+        first = registry.acquire(self.paths[0], (40, 40))
+        self.assertIs(registry.acquire(self.paths[0], (40, 40)), first)
+        registry.release(first)
+        registry.release(first)
+        registry.acquire(self.paths[1], (40, 40))
+        registry.acquire(self.paths[2], (40, 40))
+        self.assertNotIn((os.path.abspath(self.paths[0]), (40, 40)), registry.entries)
+        self.assertEqual(registry.used_bytes, 2 * 40 * 40 * 4)
+
+    def test_clear(self):
+        registry = LangProg.GlyphRegistry()
+        photo = registry.acquire(self.paths[0], (40, 40))
+        registry.clear()
+        self.assertEqual(registry.used_bytes, 0)
+        self.assertIsNot(registry.acquire(self.paths[0], (40, 40)), photo)
+        registry.release(photo)
+        self.assertEqual(registry.entries[(os.path.abspath(self.paths[0]), (40, 40))][1], 1)
+
+class SymbolArchiveTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp, "symbols.lpak")
+
+    def test_add_replace_and_reopen(self):
+        with LangProg.SymbolArchive(self.path) as archive:
+            archive.add("character_1.png", png_bytes("black"), {"sound": "p"})
+            archive.add("character_2.png", png_bytes("red"), {"sound": "b"})
+            archive.add("character_1.png", png_bytes("blue"), {"sound": "t"})
+            self.assertEqual(archive.ids(), ["character_1.png", "character_2.png"])
+        with LangProg.SymbolArchive(self.path) as archive:
+            self.assertEqual(archive.read("character_1.png"), png_bytes("blue"))
+            self.assertEqual(archive.metadata()["character_1.png"], {"sound": "t"})
+
+    def test_set_metadata_keeps_image(self):
+        with LangProg.SymbolArchive(self.path) as archive:
+            archive.add("character_1.png", png_bytes("black"), {"sound": "p"})
+            archive.set_metadata("character_1.png", {"sound": "b"})
+            self.assertEqual(archive.read("character_1.png"), png_bytes("black"))
+            self.assertEqual(archive.metadata(), {"character_1.png": {"sound": "b"}})
+            with self.assertRaises(KeyError):
+                archive.set_metadata("character_9.png", {})
+
+    def test_remove_and_compact(self):
+        with LangProg.SymbolArchive(self.path, compact_ratio=10) as archive:
+            archive.write((f"character_{i}.png", png_bytes("black", (64, 64 + i)), {}) for i in range(10))
+            archive.remove("character_0.png", "character_1.png")
+            self.assertNotIn("character_0.png", archive)
+            self.assertGreater(archive.dead_bytes, 0)
+            size = os.path.getsize(self.path)
+            archive.compact()
+            self.assertEqual(archive.dead_bytes, 0)
+            self.assertLess(os.path.getsize(self.path), size)
+            self.assertEqual(archive.read("character_5.png"), png_bytes("black", (64, 69)))
+        with LangProg.SymbolArchive(self.path) as archive:
+            self.assertEqual(len(archive), 8)
+
+    def test_compacts_automatically(self):
+        with LangProg.SymbolArchive(self.path) as archive:
+            for _ in range(5):
+                archive.add("character_1.png", png_bytes("black", (128, 128)), {})
+            self.assertLessEqual(archive.dead_bytes, archive.compact_ratio * os.path.getsize(self.path))
+
+    def test_rejects_unsafe_ids(self):
+        with LangProg.SymbolArchive(self.path) as archive:
+            archive.add("character_1.png", png_bytes("black"), {})
+            with self.assertRaises(ValueError):
+                archive.add("../evil.png", png_bytes("red"), {})
+            self.assertEqual(archive.ids(), ["character_1.png"])
+
+class PackLibraryTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.folder = os.path.join(self.tmp, "characters")
+        os.makedirs(self.folder)
+        self.archive_path = os.path.join(self.tmp, "symbols.lpak")
+        self.metadata = {}
+        for i, color in enumerate(["black", "red", "blue"]):
+            self.write_symbol(f"character_{i}.png", color, {"sound": str(i)})
+
+    def write_symbol(self, fname, color, meta):
+        with open(os.path.join(self.folder, fname), "wb") as f:
+            f.write(png_bytes(color))
+        self.metadata[fname] = meta
+        LangProg.write_metadata(os.path.join(self.folder, "metadata.json"), self.metadata)
+
+    def test_pack_and_unpack(self):
+        self.assertEqual(LangProg.pack_library(self.folder, self.archive_path), 3)
+        self.assertFalse(os.path.exists(self.archive_path + ".tmp"))
+        target = os.path.join(self.tmp, "unpacked")
+        self.assertEqual(LangProg.unpack_archive(self.archive_path, target), 3)
+        for fname in self.metadata:
+            with open(os.path.join(target, fname), "rb") as a, open(os.path.join(self.folder, fname), "rb") as b:
+                self.assertEqual(a.read(), b.read())
+        self.assertEqual(LangProg.read_metadata(os.path.join(target, "metadata.json")), self.metadata)
+
+    def test_pack_updates_existing_archive(self):
+        LangProg.pack_library(self.folder, self.archive_path)
+        self.write_symbol("character_1.png", "green", {"sound": "1"})
+        self.write_symbol("character_3.png", "black", {"sound": "3"})
+        self.metadata["character_2.png"] = {"sound": "two"}
+        os.remove(os.path.join(self.folder, "character_0.png"))
+        del self.metadata["character_0.png"]
+        LangProg.write_metadata(os.path.join(self.folder, "metadata.json"), self.metadata)
+        self.assertEqual(LangProg.pack_library(self.folder, self.archive_path), 3)
+        with LangProg.SymbolArchive(self.archive_path) as archive:
+            self.assertEqual(archive.ids(), ["character_1.png", "character_2.png", "character_3.png"])
+            self.assertEqual(archive.read("character_1.png"), png_bytes("green"))
+            self.assertEqual(archive.metadata(), self.metadata)
+
+    def test_pack_unchanged_library_writes_nothing(self):
+        LangProg.pack_library(self.folder, self.archive_path)
+        size = os.path.getsize(self.archive_path)
+        LangProg.pack_library(self.folder, self.archive_path)
+        self.assertEqual(os.path.getsize(self.archive_path), size)
+
+    def test_pack_refuses_to_overwrite_other_files(self):
+        with open(self.archive_path, "wb") as f:
+            f.write(b"not an archive, but long enough to hold a header")
+        with self.assertRaises(ValueError):
+            LangProg.pack_library(self.folder, self.archive_path)
+        with open(self.archive_path, "rb") as f:
+            self.assertTrue(f.read().startswith(b"not an archive"))
+
+class QueryTest(unittest.TestCase):
+    def test_conditions(self):
+        self.assertEqual(LangProg.parse_query("type=Character and sound in [p, b] and meaning~dog and sound!=t"),
+                         [("type", "=", "Character"), ("sound", "in", ["p", "b"]),
+                          ("meaning", "~", "dog"), ("sound", "!=", "t")])
+        self.assertEqual(LangProg.parse_query(""), [])
+
+    def test_quoted_values(self):
+        self.assertEqual(LangProg.parse_query('meaning="salt and pepper" and sound=p'),
+                         [("meaning", "=", "salt and pepper"), ("sound", "=", "p")])
+        self.assertEqual(LangProg.parse_query("""meaning in ["a, b", 'c]', d e]"""),
+                         [("meaning", "in", ["a, b", "c]", "d e"])])
+        self.assertEqual(LangProg.parse_query(r'meaning="say \"hi\""'), [("meaning", "=", 'say "hi"')])
+        self.assertEqual(LangProg.parse_query('sound=""'), [("sound", "=", "")])
+
+    def test_errors(self):
+        for query in ["color=red", "sound p", "sound in [p, b", 'meaning="open', "sound=p and"]:
+            with self.assertRaises(ValueError, msg=query):
+                LangProg.parse_query(query)
+
+    def test_select_symbols(self):
+        metadata = {
+            "character_1.png": {"type": "Character", "sound": "p", "meaning": "salt and pepper"},
+            "character_2.png": {"type": "Letter", "sound": "b", "meaning": ""},
+        }
+        files = sorted(metadata)
+        self.assertEqual(LangProg.select_symbols(metadata, files, 'meaning="salt and pepper"'), ["character_1.png"])
+        self.assertEqual(LangProg.select_symbols(metadata, files, "sound in [b, t]"), ["character_2.png"])
+
+class SentenceLayoutTest(unittest.TestCase):
+    def check(self, layout, advances):
+        full = LangProg.SentenceLayout(layout.line_width, layout.spacing)
+        full.reflow(list(advances))
+        self.assertEqual(layout.xs, full.xs)
+        self.assertEqual(layout.lines, full.lines)
+        self.assertEqual(layout.line_starts, full.line_starts)
+
+    # Random edits, inserts and deletes, reflowing from the edit point the way the sentence
+    # builder does, must always give the same layout as reflowing everything.
+    def test_incremental_reflow_matches_full_reflow(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            layout = LangProg.SentenceLayout(rng.randint(40, 300), rng.randint(0, 8))
+            advances = [rng.randint(1, 60) for _ in range(rng.randint(0, 50))]
+            layout.reflow(advances)
+            for _ in range(200):
+                action = rng.choice(["edit", "insert", "delete", "append"])
+                index = rng.randint(0, len(advances))
+                if action == "append" or (action != "insert" and index == len(advances)):
+                    advances.append(rng.randint(1, 60))
+                    index = len(advances) - 1
+                elif action == "edit":
+                    advances[index] = rng.randint(1, 60)
+                elif action == "insert":
+                    advances.insert(index, rng.randint(1, 60))
+                else:
+                    del advances[index]
+                layout.reflow(advances, index)
+                self.check(layout, advances)
+
+    def test_screen_x_mirrors_right_to_left(self):
+        layout = LangProg.SentenceLayout(100, 4)
+        layout.reflow([30, 20, 90])
+        self.assertEqual(layout.line_starts, [0, 2])
+        self.assertEqual([layout.screen_x(i, "Left-to-Right") for i in range(3)], [0, 34, 0])
+        self.assertEqual([layout.screen_x(i, "Right-to-Left") for i in range(3)], [70, 46, 10])
+
+class SentenceDocumentTest(TempDirTestCase):
+    def round_trip(self, symbols, direction):
+        path = os.path.join(self.tmp, "sentence.lpsent")
+        LangProg.save_sentence_document(path, symbols, direction)
+        self.assertEqual(LangProg.load_sentence_document(path), (symbols, direction))
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_round_trip(self):
+        symbols = ["character_1.png", "character_2.png", "character_1.png", "character_3.png"]
+        document = self.round_trip(symbols, "Right-to-Left")
+        self.assertEqual(document["index_size"], 2)
+        self.assertEqual(document["symbols"], ["character_1.png", "character_2.png", "character_3.png"])
+        self.round_trip([], "Left-to-Right")
+
+    def test_round_trip_with_wide_indices(self):
+        symbols = [f"character_{i}.png" for i in range(70000)]
+        symbols.append(symbols[0])
+        self.assertEqual(self.round_trip(symbols, "Left-to-Right")["index_size"], 4)
+
+    def test_rejects_bad_documents(self):
+        path = os.path.join(self.tmp, "sentence.lpsent")
+        LangProg.save_sentence_document(path, ["character_1.png"] * 3, "Left-to-Right")
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        for change in [{"format": "other"}, {"index_size": 3}, {"text": "AAAA"}]:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(dict(document, **change), f)
+            with self.assertRaises(ValueError, msg=change):
+                LangProg.load_sentence_document(path)
+
+class RenderServerTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.folder = os.path.join(self.tmp, "characters")
+        os.makedirs(self.folder)
+        metadata = {}
+        for i, color in enumerate(["red", "blue"]):
+            with open(os.path.join(self.folder, f"character_{i}.png"), "wb") as f:
+                f.write(png_bytes(color, (20, 20)))
+            metadata[f"character_{i}.png"] = {"type": "Letter", "sound": "pb"[i], "meaning": ""}
+        LangProg.write_metadata(os.path.join(self.folder, "metadata.json"), metadata)
+        self.metadata = metadata
+
+    def start(self, archive_path=None):
+        server = LangProg.make_render_server(self.folder, port=0, archive_path=archive_path)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        def stop():
+            server.shutdown()
+            server.server_close()
+            server.service.close()
+            thread.join()
+        self.addCleanup(stop)
+        self.base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def get(self, path, headers=None):
+        request = urllib.request.Request(self.base + path, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+    # Mean x of the pixels closest to `color`, to tell where a glyph was drawn.
+    def color_x(self, image, color):
+        xs = [x for x in range(image.width) for y in range(image.height)
+              if sum(abs(a - b) for a, b in zip(image.getpixel((x, y))[:3], color)) < 100]
+        return sum(xs) / len(xs)
+
+    def check_service(self):
+        status, _, body = self.get("/metadata")
+        self.assertEqual((status, json.loads(body)), (200, self.metadata))
+        status, _, body = self.get("/metadata/character_1.png")
+        self.assertEqual((status, json.loads(body)), (200, self.metadata["character_1.png"]))
+
+        status, headers, body = self.get("/glyph/character_0.png?size=100")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Type"], "image/png")
+        self.assertEqual(Image.open(io.BytesIO(body)).size, (100, 100))
+        status, _, body = self.get("/glyph/character_0.png?size=100", {"If-None-Match": headers["ETag"]})
+        self.assertEqual((status, body), (304, b""))
+
+        _, _, ltr = self.get("/sentence?ids=character_0.png,character_1.png&size=40")
+        _, _, rtl = self.get("/sentence?ids=character_0.png,character_1.png&size=40&dir=rtl")
+        ltr, rtl = Image.open(io.BytesIO(ltr)).convert("RGB"), Image.open(io.BytesIO(rtl)).convert("RGB")
+        self.assertLess(self.color_x(ltr, (255, 0, 0)), self.color_x(ltr, (0, 0, 255)))
+        self.assertGreater(self.color_x(rtl, (255, 0, 0)), self.color_x(rtl, (0, 0, 255)))
+        _, _, by_ipa = self.get("/sentence?" + urllib.parse.urlencode({"ipa": "pb", "size": "40"}))
+        self.assertEqual(Image.open(io.BytesIO(by_ipa)).convert("RGB").tobytes(), ltr.tobytes())
+
+        self.assertEqual(self.get("/glyph/character_9.png")[0], 404)
+        self.assertEqual(self.get("/glyph/character_0.png?size=big")[0], 400)
+        self.assertEqual(self.get("/nothing")[0], 404)
+
+    def test_folder(self):
+        self.start()
+        self.check_service()
+
+    def test_archive(self):
+        archive_path = os.path.join(self.tmp, "symbols.lpak")
+        LangProg.pack_library(self.folder, archive_path)
+        shutil.rmtree(self.folder)
+        os.makedirs(self.folder)
+        self.start(archive_path)
+        self.check_service()
+
+if __name__ == "__main__":
+    unittest.main()